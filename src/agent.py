@@ -0,0 +1,69 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple, TYPE_CHECKING
+from environment import Environment, Thermal
+from fly import defaultEnvironment, testFly
+from glider import Control, Glider
+from position import Position
+
+if TYPE_CHECKING:
+    import numpy as np
+    from evaluation import Gliders
+
+class Agent(ABC):
+    def __init__(self, environment: Environment, thermals: List[Thermal], maxAltitude: float, position: Position = Position(-100, 0, 300)) -> None:
+        self.__environment = environment
+        self.__thermals = thermals
+        self.__maxAltitude = maxAltitude
+        self.__position = position
+
+    @property
+    def maxAltitude(self) -> float:
+        return self.__maxAltitude
+
+    @property
+    def thermals(self) -> List[Thermal]:
+        return self.__thermals
+
+    @abstractmethod
+    def step(self, glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
+        pass
+
+    # Returns the pitches and rolls for all the gliders at once.
+    @abstractmethod
+    def controls(self, gliders: Gliders) -> Tuple[np.ndarray, np.ndarray]:
+        pass
+
+    # Flies with step, or with the agent's own policy if step is None.
+    def testFly(self, step: Optional[Callable[[Glider], Tuple[Control, Optional[Callable[[Glider], None]]]]] = None) -> List[Glider]:
+        return testFly(self.__environment, self.__maxAltitude, step if step is not None else self.step, self.__position)
+
+    # Called before evaluation forks its workers, so that anything built
+    # lazily is built once and shared with them.
+    def prepareWorkers(self) -> None:
+        pass
+
+    # Called in each forked evaluation worker.
+    def initializeWorker(self) -> None:
+        pass
+
+class TrainableAgent(Agent):
+    # Trains for the agent's usual number of episodes if numberOfEpisodes is
+    # None, calling onEpisode after each episode.
+    @abstractmethod
+    def train(self, numberOfEpisodes: Optional[int] = None, onEpisode: Optional[Callable[[int], None]] = None) -> None:
+        pass
+
+    @abstractmethod
+    def save(self, path: str) -> None:
+        pass
+
+    @abstractmethod
+    def load(self, path: str) -> None:
+        pass
+
+# An agent with a fixed policy flying in fly.defaultEnvironment.
+class UntrainedAgent(Agent):
+    def __init__(self) -> None:
+        environment, thermals = defaultEnvironment()
+        super().__init__(environment, thermals, 1000)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+import multiprocessing
+import numpy as np
+import sys
+from typing import Callable, List, Optional, Tuple
+from agent import Agent
+from environment import MutableEnvironment, Thermal
+from evaluation import Gliders, Scenario, StartGrid, Summary, evaluate
+from fly import fly
+from glider import Control, Glider
+from position import Position
+
+# Checks that evaluate, which flies batches of gliders with numpy, gives the
+# same results as flying each glider with fly in Scenario.environment, so that
+# changes to Glider or Environment aren't silently missed by evaluation.
+def main() -> None:
+    agent = CheckAgent()
+    grid = StartGrid.square(700, 9, 300, 4)
+    scenarios = Scenario.grid([0, 2], [4, 8], 250, 320)
+
+    expected = flyEach(agent, grid, scenarios)
+    print(expected)
+
+    numbersOfProcesses = [1]
+    if 'fork' in multiprocessing.get_all_start_methods():
+        numbersOfProcesses.append(3)
+
+    failed = False
+    for numberOfProcesses in numbersOfProcesses:
+        summary = evaluate(agent, grid, scenarios, numberOfProcesses=numberOfProcesses)
+        for name in ['success', 'climbRate', 'timeToAltitude']:
+            if not np.array_equal(getattr(summary, name), getattr(expected, name), equal_nan=True):
+                print(f'{name} differs with {numberOfProcesses} processes')
+                failed = True
+
+    if failed:
+        sys.exit(1)
+    print('ok')
+
+def flyEach(agent: Agent, grid: StartGrid, scenarios: List[Scenario]) -> Summary:
+    shape = (len(scenarios), len(grid.directions), len(grid.ys), len(grid.xs))
+    success = np.zeros(shape, dtype=bool)
+    climbRate = np.zeros(shape)
+    timeToAltitude = np.full(shape, np.nan)
+
+    for s, scenario in enumerate(scenarios):
+        environment = scenario.environment(agent.thermals)
+        for d, direction in enumerate(grid.directions):
+            for j, y in enumerate(grid.ys):
+                for i, x in enumerate(grid.xs):
+                    last: List[Glider] = []
+
+                    def step(glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
+                        control, _ = agent.step(glider)
+                        return control, last.append
+
+                    gliders = fly(Glider(Position(x, y, grid.z), direction, 0, 0), environment, 1000, agent.maxAltitude, step)
+                    steps = len(gliders)
+                    z = last[-1].position.z
+                    success[s, d, j, i] = z >= agent.maxAltitude
+                    climbRate[s, d, j, i] = (z - grid.z) / steps
+                    if z >= agent.maxAltitude:
+                        timeToAltitude[s, d, j, i] = steps
+
+    return Summary(grid, scenarios, agent.maxAltitude, success, climbRate, timeToAltitude)
+
+# Steers by its state so that any difference in the physics changes the
+# flight, with a flat thermal overlapping a log-profile one.
+class CheckAgent(Agent):
+    def __init__(self) -> None:
+        environment = MutableEnvironment()
+        thermals = [Thermal(0, 0, 100, 600, 300, 3, True), Thermal(100, 0, 50, 700, 500, 3)]
+        super().__init__(environment, thermals, 340)
+
+    def step(self, glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
+        pitch, roll = self.controls(Gliders(*(np.array([value]) for value in [glider.position.x, glider.position.y, glider.position.z, glider.direction, glider.angle, glider.bank])))
+        return Control(float(pitch[0]), float(roll[0])), None
+
+    def controls(self, gliders: Gliders) -> Tuple[np.ndarray, np.ndarray]:
+        return np.sin(gliders.z / 7 + gliders.x / 50) * 0.3 - 0.1, np.cos(gliders.direction * 3 + gliders.bank) * 0.5 + 0.3
+
+if __name__ == '__main__':
+    main()
@@ -55,6 +55,10 @@ class Thermal:
     def radius(self) -> float:
         return self.__radius
 
+    @property
+    def flat(self) -> bool:
+        return self.__flat
+
     def velocity(self, position: Position) -> Optional[float]:
         if position.z < self.__minZ or self.__maxZ <= position.z:
             return None
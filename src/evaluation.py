@@ -0,0 +1,396 @@
+from __future__ import annotations
+import math
+import multiprocessing
+import numpy as np
+import random
+from typing import Callable, List, Optional, Tuple, TYPE_CHECKING
+import warnings
+from environment import Environment, MutableEnvironment, Thermal, Wind
+from glider import Glider
+
+if TYPE_CHECKING:
+    from agent import Agent
+
+class StartGrid:
+    def __init__(self, xs: List[float], ys: List[float], z: float, directions: List[float]) -> None:
+        self.__xs = xs
+        self.__ys = ys
+        self.__z = z
+        self.__directions = directions
+
+    @property
+    def xs(self) -> List[float]:
+        return self.__xs
+
+    @property
+    def ys(self) -> List[float]:
+        return self.__ys
+
+    @property
+    def z(self) -> float:
+        return self.__z
+
+    @property
+    def directions(self) -> List[float]:
+        return self.__directions
+
+    # Gliders are ordered by direction, y and then x.
+    def gliders(self) -> Gliders:
+        direction, y, x = (values.ravel() for values in np.meshgrid(self.__directions, self.__ys, self.__xs, indexing='ij'))
+        zeros = np.zeros(len(x))
+        return Gliders(x, y, np.full(len(x), float(self.__z)), direction, zeros, zeros)
+
+    @staticmethod
+    def square(extent: float, size: int, z: float, numberOfDirections: int) -> StartGrid:
+        positions = list(np.linspace(-extent, extent, size))
+        directions = [2 * math.pi * n / numberOfDirections for n in range(numberOfDirections)]
+        return StartGrid(positions, positions, z, directions)
+
+class Scenario:
+    def __init__(self, wind: Wind, windMinZ: float, windMaxZ: float, thermalVelocity: float) -> None:
+        self.__wind = wind
+        self.__windMinZ = windMinZ
+        self.__windMaxZ = windMaxZ
+        self.__thermalVelocity = thermalVelocity
+
+    def __str__(self) -> str:
+        return f'wind:{self.wind.velocity:4.1f}@{self.wind.direction / math.pi * 180:3.0f}, thermal:{self.thermalVelocity:4.1f}'
+
+    @property
+    def wind(self) -> Wind:
+        return self.__wind
+
+    @property
+    def windMinZ(self) -> float:
+        return self.__windMinZ
+
+    @property
+    def windMaxZ(self) -> float:
+        return self.__windMaxZ
+
+    @property
+    def thermalVelocity(self) -> float:
+        return self.__thermalVelocity
+
+    # Thermals keep their shape but lift with this scenario's velocity.
+    def environment(self, thermals: List[Thermal]) -> Environment:
+        environment = MutableEnvironment()
+        environment.addWind(self.__wind, self.__windMinZ, self.__windMaxZ)
+        for thermal in thermals:
+            environment.addThermal(Thermal(thermal.x, thermal.y, thermal.minZ, thermal.maxZ, thermal.radius, self.__thermalVelocity, thermal.flat))
+        return environment
+
+    # The wind blows in the x-direction between 100 and 1000, as in
+    # fly.defaultEnvironment.
+    @staticmethod
+    def grid(windVelocities: List[float], thermalVelocities: List[float], windMinZ: float = 100, windMaxZ: float = 1000) -> List[Scenario]:
+        return [Scenario(Wind(windVelocity, 0), windMinZ, windMaxZ, thermalVelocity) for windVelocity in windVelocities for thermalVelocity in thermalVelocities]
+
+# success, climbRate and timeToAltitude are indexed by
+# [scenario, direction, y, x]. climbRate is the average vertical velocity over
+# the flight from grid.z, and timeToAltitude is the number of steps to reach
+# maxAltitude, or nan if the glider never reached it.
+class Summary:
+    def __init__(self, grid: StartGrid, scenarios: List[Scenario], maxAltitude: float, success, climbRate, timeToAltitude) -> None:
+        self.__grid = grid
+        self.__scenarios = scenarios
+        self.__maxAltitude = maxAltitude
+        self.__success = success
+        self.__climbRate = climbRate
+        self.__timeToAltitude = timeToAltitude
+
+    def __str__(self) -> str:
+        lines = [f'{scenario}, success:{self.__successRate(n):7.2%}, climb:{np.mean(self.__climbRate[n]):6.3f}, time:{self.__meanTimeToAltitude(n):6.1f}' for n, scenario in enumerate(self.__scenarios)]
+        lines.append(f'total, success:{self.successRate:7.2%}, climb:{self.meanClimbRate:6.3f}')
+        return '\n'.join(lines)
+
+    @property
+    def grid(self) -> StartGrid:
+        return self.__grid
+
+    @property
+    def scenarios(self) -> List[Scenario]:
+        return self.__scenarios
+
+    @property
+    def maxAltitude(self) -> float:
+        return self.__maxAltitude
+
+    @property
+    def success(self):
+        return self.__success
+
+    @property
+    def climbRate(self):
+        return self.__climbRate
+
+    @property
+    def timeToAltitude(self):
+        return self.__timeToAltitude
+
+    @property
+    def successRate(self) -> float:
+        return float(np.mean(self.__success))
+
+    @property
+    def meanClimbRate(self) -> float:
+        return float(np.mean(self.__climbRate))
+
+    def save(self, path: str) -> None:
+        np.savez(path,
+                 xs=self.__grid.xs,
+                 ys=self.__grid.ys,
+                 z=self.__grid.z,
+                 directions=self.__grid.directions,
+                 maxAltitude=self.__maxAltitude,
+                 windVelocities=[scenario.wind.velocity for scenario in self.__scenarios],
+                 windDirections=[scenario.wind.direction for scenario in self.__scenarios],
+                 windMinZs=[scenario.windMinZ for scenario in self.__scenarios],
+                 windMaxZs=[scenario.windMaxZ for scenario in self.__scenarios],
+                 thermalVelocities=[scenario.thermalVelocity for scenario in self.__scenarios],
+                 success=self.__success,
+                 climbRate=self.__climbRate,
+                 timeToAltitude=self.__timeToAltitude)
+
+    # Plots success rate, climb rate and time to altitude over start positions,
+    # averaged over directions, for each scenario. Shows the figure if path is
+    # None.
+    def plot(self, path: Optional[str] = None) -> None:
+        import matplotlib.pyplot as plt
+
+        numberOfScenarios = len(self.__scenarios)
+        fig, axes = plt.subplots(3, numberOfScenarios, figsize=(4 * numberOfScenarios, 12), squeeze=False)
+        extent = (self.__grid.xs[0], self.__grid.xs[-1], self.__grid.ys[0], self.__grid.ys[-1])
+
+        for n, scenario in enumerate(self.__scenarios):
+            successAxes = axes[0][n]
+            successImage = successAxes.imshow(np.mean(self.__success[n], axis=0), origin='lower', extent=extent, vmin=0, vmax=1, cmap='viridis')
+            successAxes.set_title(f'success\n{scenario}')
+            fig.colorbar(successImage, ax=successAxes)
+
+            climbAxes = axes[1][n]
+            climbImage = climbAxes.imshow(np.mean(self.__climbRate[n], axis=0), origin='lower', extent=extent, cmap='coolwarm')
+            climbAxes.set_title(f'climb\n{scenario}')
+            fig.colorbar(climbImage, ax=climbAxes)
+
+            # Positions from which no glider reached maxAltitude stay nan
+            # and are left blank.
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                timeToAltitude = np.nanmean(self.__timeToAltitude[n], axis=0)
+            timeAxes = axes[2][n]
+            timeImage = timeAxes.imshow(timeToAltitude, origin='lower', extent=extent, cmap='viridis_r')
+            timeAxes.set_title(f'time\n{scenario}')
+            fig.colorbar(timeImage, ax=timeAxes)
+
+        fig.tight_layout()
+        if path is not None:
+            fig.savefig(path)
+            plt.close(fig)
+        else:
+            plt.show()
+
+    def __successRate(self, scenario: int) -> float:
+        return float(np.mean(self.__success[scenario]))
+
+    def __meanTimeToAltitude(self, scenario: int) -> float:
+        times = self.__timeToAltitude[scenario]
+        return float(np.mean(times[~np.isnan(times)])) if self.__success[scenario].any() else math.nan
+
+# A batch of gliders held as arrays. apply and step do the same as
+# Glider.apply and Glider.step for every glider at once.
+class Gliders:
+    def __init__(self, x, y, z, direction, angle, bank) -> None:
+        self.__x = x
+        self.__y = y
+        self.__z = z
+        self.__direction = direction
+        self.__angle = angle
+        self.__bank = bank
+
+    def __len__(self) -> int:
+        return len(self.__x)
+
+    def __getitem__(self, indices) -> Gliders:
+        return Gliders(self.__x[indices], self.__y[indices], self.__z[indices], self.__direction[indices], self.__angle[indices], self.__bank[indices])
+
+    @property
+    def x(self):
+        return self.__x
+
+    @property
+    def y(self):
+        return self.__y
+
+    @property
+    def z(self):
+        return self.__z
+
+    @property
+    def direction(self):
+        return self.__direction
+
+    @property
+    def angle(self):
+        return self.__angle
+
+    @property
+    def bank(self):
+        return self.__bank
+
+    @property
+    def horizontalVelocity(self):
+        angle = self.__angle
+        return np.where(angle > Glider.stallAngle, 0,
+                        np.where(angle > 0, 10 - angle / Glider.maxAngle * 3, 10 + angle / Glider.minAngle * 10))
+
+    @property
+    def verticalVelocity(self):
+        angle = self.__angle
+        bankFactor = 1 + np.sin(np.abs(self.__bank))
+        return np.where(angle > Glider.stallAngle, -10,
+                        np.where(angle >= 0, (-1 + angle / Glider.stallAngle / 2) * bankFactor, (-1 + angle / Glider.stallAngle) * bankFactor))
+
+    @property
+    def angularVelocity(self):
+        return -self.__bank / 6
+
+    def apply(self, pitch, roll) -> Gliders:
+        angle = np.clip(self.__angle + pitch * math.pi / 36, Glider.minAngle, Glider.maxAngle)
+        bank = np.clip(self.__bank + roll * math.pi / 36, Glider.minBank, Glider.maxBank)
+        return Gliders(self.__x, self.__y, self.__z, self.__direction, angle, bank)
+
+    def step(self, environments: Environments) -> Gliders:
+        horizontalMove = self.horizontalVelocity
+        direction = np.mod(self.__direction + self.angularVelocity, 2 * math.pi)
+        windVelocity, windDirection = environments.horizontalWind(self)
+        x = np.cos(direction) * horizontalMove + np.cos(windDirection) * windVelocity
+        y = np.sin(direction) * horizontalMove + np.sin(windDirection) * windVelocity
+        z = self.verticalVelocity + environments.verticalWindVelocity(self)
+        return Gliders(self.__x + x, self.__y + y, self.__z + z, direction, self.__angle, self.__bank)
+
+# The environment of each glider in a Gliders, as Scenario.environment would
+# build it. horizontalWind and verticalWindVelocity do the same as
+# MutableEnvironment's for every glider at once.
+class Environments:
+    def __init__(self, thermals: List[Thermal], windVelocity, windDirection, windMinZ, windMaxZ, thermalVelocity) -> None:
+        self.__thermals = thermals
+        self.__windVelocity = windVelocity
+        self.__windDirection = windDirection
+        self.__windMinZ = windMinZ
+        self.__windMaxZ = windMaxZ
+        self.__thermalVelocity = thermalVelocity
+
+    def __getitem__(self, indices) -> Environments:
+        return Environments(self.__thermals, self.__windVelocity[indices], self.__windDirection[indices], self.__windMinZ[indices], self.__windMaxZ[indices], self.__thermalVelocity[indices])
+
+    def horizontalWind(self, gliders: Gliders) -> Tuple[np.ndarray, np.ndarray]:
+        contains = (self.__windMinZ <= gliders.z) & (gliders.z < self.__windMaxZ)
+        return np.where(contains, self.__windVelocity, 0), np.where(contains, self.__windDirection, 0)
+
+    # The first thermal containing a glider decides its velocity.
+    def verticalWindVelocity(self, gliders: Gliders):
+        velocity = np.zeros(len(gliders))
+        found = np.zeros(len(gliders), dtype=bool)
+        for thermal in self.__thermals:
+            distance = np.sqrt((gliders.x - thermal.x) ** 2 + (gliders.y - thermal.y) ** 2)
+            contains = ~found & (thermal.minZ <= gliders.z) & (gliders.z < thermal.maxZ) & (distance <= thermal.radius)
+            if thermal.flat:
+                thermalVelocity = self.__thermalVelocity
+            else:
+                thermalVelocity = np.log2(2 - np.minimum(distance, thermal.radius) / thermal.radius) * self.__thermalVelocity
+            velocity = np.where(contains, thermalVelocity, velocity)
+            found |= contains
+        return velocity
+
+    # Environments for numberOfGliders gliders under each scenario in turn.
+    @staticmethod
+    def repeat(thermals: List[Thermal], scenarios: List[Scenario], numberOfGliders: int) -> Environments:
+        def values(value: Callable[[Scenario], float]) -> np.ndarray:
+            return np.repeat([float(value(scenario)) for scenario in scenarios], numberOfGliders)
+
+        return Environments(thermals,
+                            values(lambda scenario: scenario.wind.velocity),
+                            values(lambda scenario: scenario.wind.direction),
+                            values(lambda scenario: scenario.windMinZ),
+                            values(lambda scenario: scenario.windMaxZ),
+                            values(lambda scenario: scenario.thermalVelocity))
+
+# State shared with forked workers by evaluate. These have to be declared
+# before evaluate declares them global, or Python 3.7 rejects the annotations.
+_agent: Optional[Agent] = None
+_gliders: Optional[Gliders] = None
+_environments: Optional[Environments] = None
+_maxNumberOfSteps = 0
+
+# Flies all the gliders in the grid under all the scenarios with the agent's
+# policy.
+#
+# The gliders still flying are moved together with numpy, and the agent picks
+# controls for all of them with one call per step. Runs can also be split
+# across numberOfProcesses forked worker processes. Workers inherit the agent
+# rather than having it pickled, since a Q table can be several gigabytes.
+# Where fork isn't available, as on Windows, runs stay in this process.
+def evaluate(agent: Agent, grid: StartGrid, scenarios: List[Scenario], maxNumberOfSteps: int = 1000, numberOfProcesses: int = 1) -> Summary:
+    global _agent, _gliders, _environments, _maxNumberOfSteps
+
+    startGliders = grid.gliders()
+    gliders = startGliders[np.tile(np.arange(len(startGliders)), len(scenarios))]
+    environments = Environments.repeat(agent.thermals, scenarios, len(startGliders))
+
+    if numberOfProcesses > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        agent.prepareWorkers()
+        _agent, _gliders, _environments, _maxNumberOfSteps = agent, gliders, environments, maxNumberOfSteps
+        try:
+            bounds = np.linspace(0, len(gliders), numberOfProcesses + 1).astype(int)
+            with multiprocessing.get_context('fork').Pool(numberOfProcesses, initializer=_initializeWorker) as pool:
+                results = pool.map(_simulateRange, zip(bounds[:-1], bounds[1:]))
+        finally:
+            _agent, _gliders, _environments = None, None, None
+        success, finalZ, steps = (np.concatenate(values) for values in zip(*results))
+    else:
+        success, finalZ, steps = simulate(agent, gliders, environments, maxNumberOfSteps)
+
+    shape = (len(scenarios), len(grid.directions), len(grid.ys), len(grid.xs))
+    climbRate = (finalZ - grid.z) / steps
+    timeToAltitude = np.where(success, steps, np.nan)
+    return Summary(grid, scenarios, agent.maxAltitude, success.reshape(shape), climbRate.reshape(shape), timeToAltitude.reshape(shape))
+
+# Returns whether each glider reached agent.maxAltitude, its final altitude and
+# the number of steps it flew, in the same way as fly does.
+def simulate(agent: Agent, gliders: Gliders, environments: Environments, maxNumberOfSteps: int):
+    success = np.zeros(len(gliders), dtype=bool)
+    finalZ = np.array(gliders.z, dtype=float)
+    steps = np.full(len(gliders), maxNumberOfSteps)
+
+    active = np.arange(len(gliders))
+    for n in range(maxNumberOfSteps):
+        if len(active) == 0:
+            break
+
+        pitch, roll = agent.controls(gliders)
+        gliders = gliders.apply(pitch, roll).step(environments)
+        finalZ[active] = gliders.z
+
+        landed = gliders.z <= 0
+        reached = ~landed & (gliders.z >= agent.maxAltitude)
+        success[active[reached]] = True
+        steps[active[landed | reached]] = n + 1
+
+        flying = ~(landed | reached)
+        active = active[flying]
+        gliders = gliders[flying]
+        environments = environments[flying]
+
+    return success, finalZ, steps
+
+def _initializeWorker() -> None:
+    assert _agent is not None
+    random.seed()
+    np.random.seed()
+    _agent.initializeWorker()
+
+def _simulateRange(bounds: Tuple[int, int]):
+    assert _agent is not None and _gliders is not None and _environments is not None
+    start, end = bounds
+    return simulate(_agent, _gliders[start:end], _environments[start:end], _maxNumberOfSteps)
@@ -1,26 +1,22 @@
-import matplotlib.pyplot as plt
-import numpy as np
 from typing import Callable, List, Optional, Tuple
 from environment import Environment, MutableEnvironment, Thermal, Wind
 from glider import Control, Glider
 from position import Position
 
-def testFly(step: Callable[[Glider], Tuple[Control, Optional[Callable[[Glider], None]]]]) -> None:
+def testFly(environment: Environment, maxAltitude: float, step: Callable[[Glider], Tuple[Control, Optional[Callable[[Glider], None]]]], position: Position = Position(-100, 0, 300)) -> List[Glider]:
     maxNumberOfSteps = 1000
 
+    glider = Glider(position, 0, 0, 0)
+
+    return fly(glider, environment, maxNumberOfSteps, maxAltitude, step)
+
+def defaultEnvironment() -> Tuple[MutableEnvironment, List[Thermal]]:
     environment = MutableEnvironment()
     environment.addWind(Wind(1, 0), 100, 1000)
     thermals = [Thermal(0, 0, 100, 600, 500, 3)]
     for thermal in thermals:
         environment.addThermal(thermal)
-
-    glider = Glider(Position(-100, 0, 300), 0, 0, 0)
-
-    gliders = fly(glider, environment, maxNumberOfSteps, 1000, step)
-
-    for index, glider in enumerate(gliders):
-        print(index, glider)
-    plot(gliders, thermals)
+    return environment, thermals
 
 def fly(glider: Glider, environment: Environment, maxNumberOfSteps: int, maxAltitude: float, step: Callable[[Glider], Tuple[Control, Optional[Callable[[Glider], None]]]]) -> List[Glider]:
     gliders: List[Glider] = []
@@ -41,7 +37,16 @@ def fly(glider: Glider, environment: Environment, maxNumberOfSteps: int, maxAlti
 
     return gliders
 
+def printGliders(gliders: List[Glider]) -> None:
+    for index, glider in enumerate(gliders):
+        print(index, glider)
+
+# matplotlib and numpy are imported here rather than at the top of the module
+# so that flying without plotting doesn't pay for loading them.
 def plot(gliders: List[Glider], thermals: List[Thermal] = []) -> None:
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     fig = plt.figure(figsize=(8, 8))
     ax = fig.add_subplot(1, 1, 1, projection='3d')
 
@@ -59,6 +64,8 @@ def plot(gliders: List[Glider], thermals: List[Thermal] = []) -> None:
     plt.show()
 
 def cylinder(x: float, y: float, minZ: float, maxZ: float, radius: float):
+    import numpy as np
+
     gridZ = np.linspace(minZ, maxZ, 50)
     theta = np.linspace(0, 2 * np.pi, 50)
     gridTheta, gridZ = np.meshgrid(theta, gridZ)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+import argparse
+import importlib
+from typing import cast, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from agent import Agent, TrainableAgent
+    from evaluation import Summary
+
+# Agents are imported by name when a command runs, so that e.g. flying the
+# random agent doesn't load torch, and parsing arguments doesn't load anything.
+agents = {
+    'q': 'main_q',
+    'dqn': 'main_dqn',
+    'random': 'main_random',
+    'stright': 'main_stright',
+}
+
+trainableAgents = ['q', 'dqn']
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    agentParsers = parser.add_subparsers(dest='agent', required=True)
+    for agent in agents:
+        agentParser = agentParsers.add_parser(agent)
+        commandParsers = agentParser.add_subparsers(dest='command', required=True)
+
+        if agent in trainableAgents:
+            trainParser = commandParsers.add_parser('train')
+            trainParser.add_argument('--episodes', type=int)
+            trainParser.add_argument('--load')
+            trainParser.add_argument('--save')
+            trainParser.add_argument('--sweep-every', type=int)
+            trainParser.add_argument('--sweep-output', help='path to save each sweep to, with {episode} replaced by the episode')
+            trainParser.add_argument('--sweep-heatmap', help='path to plot each sweep to, with {episode} replaced by the episode')
+            addSweepArguments(trainParser)
+            trainParser.set_defaults(func=train)
+
+        evalParser = commandParsers.add_parser('eval')
+        plotParser = commandParsers.add_parser('plot')
+        sweepParser = commandParsers.add_parser('sweep')
+        if agent in trainableAgents:
+            evalParser.add_argument('--load')
+            plotParser.add_argument('--load')
+            sweepParser.add_argument('--load')
+        addSweepArguments(sweepParser)
+        sweepParser.add_argument('--output')
+        sweepParser.add_argument('--heatmap')
+        evalParser.set_defaults(func=evaluate)
+        plotParser.set_defaults(func=plotFlight)
+        sweepParser.set_defaults(func=sweep)
+
+    args = parser.parse_args()
+    args.func(args)
+
+def addSweepArguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--extent', type=float, default=1000)
+    parser.add_argument('--size', type=int, default=21)
+    parser.add_argument('--altitude', type=float, default=300)
+    parser.add_argument('--directions', type=int, default=8)
+    parser.add_argument('--winds', type=float, nargs='+', default=[0, 1, 3])
+    parser.add_argument('--thermals', type=float, nargs='+', default=[3])
+    parser.add_argument('--processes', type=int, default=1, help='number of forked worker processes')
+
+def makeAgent(args) -> Agent:
+    agent: Agent = importlib.import_module(agents[args.agent]).Agent()
+    # Only trainable agents have --load.
+    if getattr(args, 'load', None) is not None:
+        cast('TrainableAgent', agent).load(args.load)
+    return agent
+
+def train(args) -> None:
+    agent = cast('TrainableAgent', makeAgent(args))
+
+    onEpisode = None
+    if args.sweep_every is not None:
+        def onEpisode(episode: int) -> None:
+            if (episode + 1) % args.sweep_every == 0:
+                summary = runSweep(agent, args)
+                print(f'{episode}: success:{summary.successRate:7.2%}, climb:{summary.meanClimbRate:6.3f}')
+
+                if args.sweep_output is not None:
+                    summary.save(args.sweep_output.format(episode=episode))
+                if args.sweep_heatmap is not None:
+                    summary.plot(args.sweep_heatmap.format(episode=episode))
+
+    agent.train(args.episodes, onEpisode)
+
+    if args.save is not None:
+        agent.save(args.save)
+
+def evaluate(args) -> None:
+    agent = makeAgent(args)
+    gliders = agent.testFly()
+    print(f'steps:{len(gliders)}, {gliders[-1]}')
+
+def plotFlight(args) -> None:
+    from fly import printGliders, plot
+
+    agent = makeAgent(args)
+    gliders = agent.testFly()
+
+    printGliders(gliders)
+    plot(gliders, agent.thermals)
+
+def sweep(args) -> None:
+    agent = makeAgent(args)
+    summary = runSweep(agent, args)
+    print(summary)
+
+    if args.output is not None:
+        summary.save(args.output)
+    if args.heatmap is not None:
+        summary.plot(args.heatmap)
+
+def runSweep(agent: Agent, args) -> Summary:
+    import evaluation
+
+    grid = evaluation.StartGrid.square(args.extent, args.size, args.altitude, args.directions)
+    scenarios = evaluation.Scenario.grid(args.winds, args.thermals)
+    return evaluation.evaluate(agent, grid, scenarios, numberOfProcesses=args.processes)
+
+if __name__ == '__main__':
+    main()
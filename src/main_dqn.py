@@ -1,3 +1,4 @@
+from __future__ import annotations
 import argparse
 from collections import namedtuple
 import numpy as np
@@ -5,62 +6,91 @@ import random
 import torch
 from torch import nn
 from torch import optim
-from typing import Callable, List, Optional, Tuple
-from environment import Environment, MutableEnvironment, Thermal, Wind
-from fly import fly, plot
+from typing import Callable, List, Optional, Tuple, TYPE_CHECKING
+from agent import TrainableAgent
+from environment import MutableEnvironment, Thermal, Wind
+from fly import printGliders, plot
 from glider import Control, Glider
-from position import Position
+
+if TYPE_CHECKING:
+    from evaluation import Gliders
 
 def main(args) -> None:
-    maxAltitude = 500
-    numberOfStates = 4
-    numberOfPitchActions = 10
-    numberOfRollActions = 10
-    batchSize = 32
-    transitionsCapacity = 10000
-
-    actionControl = ActionControl(numberOfPitchActions, numberOfRollActions)
-    dqn = DQN(numberOfStates, actionControl.numberOfActions, batchSize, transitionsCapacity)
-
-    environment = MutableEnvironment()
-#    environment.addWind(Wind(1, 0), 100, 1000)
-    thermals = [Thermal(0, 0, 100, 600, 500, 3)]
-    for thermal in thermals:
-        environment.addThermal(thermal)
-
-    for episode in range(10000):
-        def stepTrain(glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
-            state = stateFromGlider(glider)
-            action = dqn.action(state, episode)
-            control = actionControl.control(action)
-
-            def update(nextGlider: Glider) -> None:
-                nextState = stateFromGlider(nextGlider)
-                reward = -1 if nextGlider.position.z <= 0 else 1 if nextGlider.position.z >= maxAltitude else 0
-                transition = makeTransition(state, action, nextState, reward)
-                dqn.update(transition)
-
-            return control, update
-
-        testFly(environment, maxAltitude, stepTrain)
-
-    def stepTest(glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
+    agent = Agent()
+
+    if args.load is not None:
+        agent.load(args.load)
+    else:
+        agent.train()
+
+    gliders = agent.testFly()
+
+    printGliders(gliders)
+    plot(gliders, agent.thermals)
+
+    if args.save is not None:
+        agent.save(args.save)
+
+class Agent(TrainableAgent):
+    def __init__(self) -> None:
+        maxAltitude = 500
+        numberOfStates = 4
+        numberOfPitchActions = 10
+        numberOfRollActions = 10
+        batchSize = 32
+        transitionsCapacity = 10000
+
+        self.__actionControl = ActionControl(numberOfPitchActions, numberOfRollActions)
+        self.__dqn = DQN(numberOfStates, self.__actionControl.numberOfActions, batchSize, transitionsCapacity)
+
+        environment = MutableEnvironment()
+#        environment.addWind(Wind(1, 0), 100, 1000)
+        thermals = [Thermal(0, 0, 100, 600, 500, 3)]
+        for thermal in thermals:
+            environment.addThermal(thermal)
+
+        super().__init__(environment, thermals, maxAltitude)
+
+    def train(self, numberOfEpisodes: Optional[int] = None, onEpisode: Optional[Callable[[int], None]] = None) -> None:
+        for episode in range(numberOfEpisodes if numberOfEpisodes is not None else 10000):
+            def stepTrain(glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
+                state = stateFromGlider(glider)
+                action = self.__dqn.action(state, episode)
+                control = self.__actionControl.control(action)
+
+                def update(nextGlider: Glider) -> None:
+                    nextState = stateFromGlider(nextGlider)
+                    reward = -1 if nextGlider.position.z <= 0 else 1 if nextGlider.position.z >= self.maxAltitude else 0
+                    transition = makeTransition(state, action, nextState, reward)
+                    self.__dqn.update(transition)
+
+                return control, update
+
+            self.testFly(stepTrain)
+
+            if onEpisode is not None:
+                onEpisode(episode)
+
+    def step(self, glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
         state = stateFromGlider(glider)
-        action = dqn.action(state)
-        control = actionControl.control(action)
+        action = self.__dqn.action(state)
+        control = self.__actionControl.control(action)
         return control, None
-    gliders = testFly(environment, maxAltitude, stepTest)
 
-    for index, glider in enumerate(gliders):
-        print(index, glider)
-    plot(gliders, thermals)
+    def controls(self, gliders: Gliders) -> Tuple[np.ndarray, np.ndarray]:
+        states = np.stack([gliders.z, gliders.direction, gliders.angle, gliders.bank], axis=1)
+        return self.__actionControl.controls(self.__dqn.actions(states))
 
-def testFly(environment: Environment, maxAltitude: float, step: Callable[[Glider], Tuple[Control, Optional[Callable[[Glider], None]]]]) -> List[Glider]:
-    maxNumberOfSteps = 1000
+    # Each worker runs its own forward passes, so letting each of them use
+    # all the cores would oversubscribe the CPU.
+    def initializeWorker(self) -> None:
+        torch.set_num_threads(1)
 
-    glider = Glider(Position(-100, 0, 300), 0, 0, 0)
+    def save(self, path: str) -> None:
+        self.__dqn.save(path)
 
-    return fly(glider, environment, maxNumberOfSteps, maxAltitude, step)
+    def load(self, path: str) -> None:
+        self.__dqn.load(path)
 
 State = Tuple[float, float, float, float]
 Action = int
@@ -103,6 +133,11 @@ class ActionControl:
 
         return Control(pitch, roll)
 
+    def controls(self, actions):
+        pitches = (actions % self.__numberOfPitchActions) / self.__numberOfPitchActions * 2 - 1
+        rolls = (actions // self.__numberOfPitchActions) / self.__numberOfRollActions * 2 - 1
+        return pitches, rolls
+
 Transition = namedtuple('Transition', ('state', 'action', 'nextState', 'reward'))
 
 class Transitions:
@@ -141,7 +176,7 @@ class DQN:
         self.__model.add_module('relu2', nn.ReLU())
         self.__model.add_module('fc3', nn.Linear(fc2Features, numberOfActions))
 
-        self.__optimizer = optim.Adam(self.__model.parameters(), lr=0.0001)
+        self.__adam: Optional[optim.Adam] = None
 
     def update(self, transition: Transition) -> None:
         self.__transitions.push(transition)
@@ -181,6 +216,26 @@ class DQN:
             with torch.no_grad():
                 return self.__model(stateTensor(state)).max(1)[1].item()
 
+    def actions(self, states):
+        self.__model.eval()
+        with torch.no_grad():
+            return self.__model(torch.as_tensor(states, dtype=torch.float32)).max(1)[1].numpy()
+
+    def save(self, path: str) -> None:
+        torch.save(self.__model.state_dict(), path)
+
+    def load(self, path: str) -> None:
+        self.__model.load_state_dict(torch.load(path))
+
+    # Creating the first optimizer takes seconds, so it's created on first use
+    # to keep evaluating a saved model fast. torch itself stays a module-level
+    # import because every use of this module builds the model.
+    @property
+    def __optimizer(self) -> optim.Adam:
+        if self.__adam is None:
+            self.__adam = optim.Adam(self.__model.parameters(), lr=0.0001)
+        return self.__adam
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -1,73 +1,95 @@
+from __future__ import annotations
 import argparse
 import math
 import numpy as np
-from typing import Callable, List, Optional, Tuple
-from environment import Environment, MutableEnvironment, Thermal, Wind
-from fly import fly, plot
+from typing import Callable, Optional, Tuple, TYPE_CHECKING
+from agent import TrainableAgent
+from environment import MutableEnvironment, Thermal, Wind
+from fly import printGliders, plot
 from glider import Control, Glider
 from position import Position
 
+if TYPE_CHECKING:
+    from evaluation import Gliders
+
 def main(args) -> None:
-    maxAltitude = 500
-    numberOfDirections = 36 * 2
-    numberOfAngles = 10 * 2
-    numberOfBanks = 10 * 2
-    numberOfPitchActions = 10
-    numberOfRollActions = 10
-
-    stateDigitizer = StateDigitizer(maxAltitude, numberOfDirections, numberOfAngles, numberOfBanks)
-    actionControl = ActionControl(numberOfPitchActions, numberOfRollActions)
-    q = Q(stateDigitizer.numberOfStates, actionControl.numberOfActions)
-
-    environment = MutableEnvironment()
-#    environment.addWind(Wind(1, 0), 100, 1000)
-    thermals = [Thermal(0, 0, 100, 600, 500, 3)]
-    for thermal in thermals:
-        environment.addThermal(thermal)
+    agent = Agent()
 
     if args.load is not None:
-        q.load(args.load)
+        agent.load(args.load)
     else:
-        for episode in range(1000):
+        agent.train()
+
+    gliders = agent.testFly()
+
+    printGliders(gliders)
+    plot(gliders, agent.thermals)
+
+    if args.save is not None:
+        agent.save(args.save)
+
+class Agent(TrainableAgent):
+    def __init__(self) -> None:
+        maxAltitude = 500
+        numberOfDirections = 36 * 2
+        numberOfAngles = 10 * 2
+        numberOfBanks = 10 * 2
+        numberOfPitchActions = 10
+        numberOfRollActions = 10
+
+        self.__stateDigitizer = StateDigitizer(maxAltitude, numberOfDirections, numberOfAngles, numberOfBanks)
+        self.__actionControl = ActionControl(numberOfPitchActions, numberOfRollActions)
+        self.__q = Q(self.__stateDigitizer.numberOfStates, self.__actionControl.numberOfActions)
+
+        environment = MutableEnvironment()
+#        environment.addWind(Wind(1, 0), 100, 1000)
+        thermals = [Thermal(0, 0, 100, 600, 500, 3)]
+        for thermal in thermals:
+            environment.addThermal(thermal)
+
+        super().__init__(environment, thermals, maxAltitude, Position(-300, 0, 300))
+
+    def train(self, numberOfEpisodes: Optional[int] = None, onEpisode: Optional[Callable[[int], None]] = None) -> None:
+        for episode in range(numberOfEpisodes if numberOfEpisodes is not None else 1000):
             def stepTrain(glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
-                state = stateDigitizer.state(glider)
-                action = q.action(state, episode)
-                control = actionControl.control(action)
+                state = self.__stateDigitizer.state(glider)
+                action = self.__q.action(state, episode)
+                control = self.__actionControl.control(action)
 
                 def update(nextGlider: Glider) -> None:
-                    nextState = stateDigitizer.state(nextGlider)
+                    nextState = self.__stateDigitizer.state(nextGlider)
                     reward = -5 if nextGlider.isStalled else \
                              -1 if nextGlider.position.z <= 0 else \
-                              1 if nextGlider.position.z >= maxAltitude else \
+                              1 if nextGlider.position.z >= self.maxAltitude else \
                            -0.1 if nextGlider.position.z < glider.position.z else \
                             0.5 if nextGlider.position.z > glider.position.z else 0
-                    q.update(state, action, reward, nextState)
+                    self.__q.update(state, action, reward, nextState)
 
                 return control, update
 
-            gliders = testFly(environment, maxAltitude, stepTrain)
+            gliders = self.testFly(stepTrain)
             print(f"{episode}: {gliders[-1].position.z}")
 
-    def stepTest(glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
-        state = stateDigitizer.state(glider)
-        action = q.action(state)
-        control = actionControl.control(action)
-        return control, None
-    gliders = testFly(environment, maxAltitude, stepTest)
+            if onEpisode is not None:
+                onEpisode(episode)
 
-    for index, glider in enumerate(gliders):
-        print(index, glider)
-    plot(gliders, thermals)
+    def step(self, glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
+        state = self.__stateDigitizer.state(glider)
+        action = self.__q.action(state)
+        control = self.__actionControl.control(action)
+        return control, None
 
-    if args.save is not None:
-        q.save(args.save)
+    def controls(self, gliders: Gliders) -> Tuple[np.ndarray, np.ndarray]:
+        return self.__actionControl.controls(self.__q.actions(self.__stateDigitizer.states(gliders)))
 
-def testFly(environment: Environment, maxAltitude: float, step: Callable[[Glider], Tuple[Control, Optional[Callable[[Glider], None]]]]) -> List[Glider]:
-    maxNumberOfSteps = 1000
+    def prepareWorkers(self) -> None:
+        self.__q.initialize()
 
-    glider = Glider(Position(-300, 0, 300), 0, 0, 0)
+    def save(self, path: str) -> None:
+        self.__q.save(path)
 
-    return fly(glider, environment, maxNumberOfSteps, maxAltitude, step)
+    def load(self, path: str) -> None:
+        self.__q.load(path)
 
 State = int
 Action = int
@@ -91,6 +113,11 @@ class ActionControl:
 
         return Control(pitch, roll)
 
+    def controls(self, actions):
+        pitches = (actions % self.__numberOfPitchActions) / self.__numberOfPitchActions * 2 - 1
+        rolls = (actions // self.__numberOfPitchActions) / self.__numberOfRollActions * 2 - 1
+        return pitches, rolls
+
 class StateDigitizer:
     def __init__(self, maxAltitude: float, numberOfDirections: int, numberOfAngles: int, numberOfBanks: int) -> None:
         self.__numberOfZs = int(maxAltitude)
@@ -108,15 +135,22 @@ class StateDigitizer:
         return self.__numberOfZs * self.__numberOfDirections * self.__numberOfAngles * self.__numberOfBanks
 
     def state(self, glider: Glider) -> State:
-        z = np.digitize(glider.position.z, bins=self.__zBins)
-        direction = np.digitize(glider.direction, bins=self.__directionBins)
-        angle = np.digitize(glider.angle, bins=self.__angleBins)
-        bank = np.digitize(glider.bank, bins=self.__bankBins)
+        return State(self.__digitize(glider.position.z, glider.direction, glider.angle, glider.bank))
+
+    def states(self, gliders):
+        return self.__digitize(gliders.z, gliders.direction, gliders.angle, gliders.bank)
+
+    # Works on both scalars and arrays.
+    def __digitize(self, z, direction, angle, bank):
+        zIndex = np.digitize(z, bins=self.__zBins)
+        directionIndex = np.digitize(direction, bins=self.__directionBins)
+        angleIndex = np.digitize(angle, bins=self.__angleBins)
+        bankIndex = np.digitize(bank, bins=self.__bankBins)
 
-        return z + \
-            direction * self.__numberOfZs + \
-            angle * self.__numberOfZs * self.__numberOfDirections + \
-            bank * self.__numberOfZs * self.__numberOfDirections * self.__numberOfAngles
+        return zIndex + \
+            directionIndex * self.__numberOfZs + \
+            angleIndex * self.__numberOfZs * self.__numberOfDirections + \
+            bankIndex * self.__numberOfZs * self.__numberOfDirections * self.__numberOfAngles
 
     @staticmethod
     def __bins(min: float, max: float, number: int):
@@ -124,10 +158,11 @@ class StateDigitizer:
 
 class Q:
     def __init__(self, numberOfStates: State, numberOfActions: Action, eta: float = 0.5, gamma: float = 0.99) -> None:
+        self.__numberOfStates = numberOfStates
         self.__numberOfActions = numberOfActions
         self.__eta = eta
         self.__gamma = gamma
-        self.__table = np.random.uniform(low=0, high=1, size=(numberOfStates, numberOfActions))
+        self.__values: Optional[np.ndarray] = None
 
     def action(self, state: State, episode: Optional[int] = None) -> Action:
         isRandom = False
@@ -140,6 +175,9 @@ class Q:
         else:
             return Action(np.argmax(self.__table[state][:]))
 
+    def actions(self, states):
+        return np.argmax(self.__table[states], axis=1)
+
     def update(self, state: State, action: Action, reward: Reward, nextState: State) -> None:
         maxQNext = max(self.__table[nextState][:])
         self.__table[state, action] = (self.__table[state, action] +
@@ -149,7 +187,19 @@ class Q:
         np.save(path, self.__table)
 
     def load(self, path: str) -> None:
-        self.__table = np.load(path)
+        self.__values = np.load(path)
+
+    # The table is large, so it's initialized on first use to avoid filling it
+    # with random values only to be replaced by load. Call this to initialize
+    # it up front, e.g. before forking processes that should share it.
+    def initialize(self) -> None:
+        if self.__values is None:
+            self.__values = np.random.uniform(low=0, high=1, size=(self.__numberOfStates, self.__numberOfActions))
+
+    @property
+    def __table(self):
+        self.initialize()
+        return self.__values
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -1,11 +1,31 @@
+from __future__ import annotations
 import random
-from fly import testFly
-from glider import Control
+from typing import Callable, Optional, Tuple, TYPE_CHECKING
+from agent import UntrainedAgent
+from fly import printGliders, plot
+from glider import Control, Glider
+
+if TYPE_CHECKING:
+    import numpy as np
+    from evaluation import Gliders
 
 def main() -> None:
     random.seed()
 
-    testFly(lambda glider: (Control(random.uniform(-1, 1), random.uniform(-1, 1)), None))
+    agent = Agent()
+    gliders = agent.testFly()
+
+    printGliders(gliders)
+    plot(gliders, agent.thermals)
+
+class Agent(UntrainedAgent):
+    def step(self, glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
+        return Control(random.uniform(-1, 1), random.uniform(-1, 1)), None
+
+    def controls(self, gliders: Gliders) -> Tuple[np.ndarray, np.ndarray]:
+        import numpy as np
+
+        return np.random.uniform(-1, 1, len(gliders)), np.random.uniform(-1, 1, len(gliders))
 
 if __name__ == '__main__':
     main()
@@ -1,8 +1,28 @@
-from fly import testFly
-from glider import Control
+from __future__ import annotations
+from typing import Callable, Optional, Tuple, TYPE_CHECKING
+from agent import UntrainedAgent
+from fly import printGliders, plot
+from glider import Control, Glider
+
+if TYPE_CHECKING:
+    import numpy as np
+    from evaluation import Gliders
 
 def main() -> None:
-    testFly(lambda glider: (Control(0, 0), None))
+    agent = Agent()
+    gliders = agent.testFly()
+
+    printGliders(gliders)
+    plot(gliders, agent.thermals)
+
+class Agent(UntrainedAgent):
+    def step(self, glider: Glider) -> Tuple[Control, Optional[Callable[[Glider], None]]]:
+        return Control(0, 0), None
+
+    def controls(self, gliders: Gliders) -> Tuple[np.ndarray, np.ndarray]:
+        import numpy as np
+
+        return np.zeros(len(gliders)), np.zeros(len(gliders))
 
 if __name__ == '__main__':
     main()